@@ -6,9 +6,12 @@ import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import mysql.connector
-from sqlalchemy import create_engine
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import SimpleNamespace
+import connectorx as cx
 import base64
+import io
 from pdf_generator import create_pdf_report, create_download_link
 
 # Page configuration
@@ -23,69 +26,247 @@ st.set_page_config(
 st.title("📊 DMS Analytics Dashboard")
 st.markdown("---")
 
-# Database connection function
-@st.cache_resource
-def init_connection():
+# Replace with your actual database credentials
+DB_CONFIG = {
+    'host': '127.0.0.1',
+    'database': 'ispsc_tagudin_dms_db',
+    'user': 'root',  # Replace with your username
+    'password': '',  # Replace with your password
+    'port': 3306
+}
+
+DB_URI = f"mysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+
+# Queries go through connectorx, which streams Arrow buffers straight out of
+# MySQL instead of materialising a Python tuple per row. The frames stay
+# pyarrow-backed, so the string-heavy columns compare and group on Arrow
+# kernels rather than as Python objects.
+def read_frame(sql):
+    return cx.read_sql(DB_URI, sql, return_type="arrow2").to_pandas(types_mapper=pd.ArrowDtype)
+
+# Run independent queries concurrently so the round-trips overlap instead of
+# paying each network latency in sequence; connectorx opens its own
+# connection per call.
+def run_queries(queries):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = {name: executor.submit(read_frame, sql) for name, sql in queries.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+# One cached loader per table, each keyed only on its own dependencies, so a
+# rerun or cache miss for one table never reloads the others. On failure a
+# loader reports the error and returns an empty frame; the sections degrade
+# to their "no data" messages instead of stopping the whole app.
+@st.cache_data(ttl=3600)
+def load_departments():
     try:
-        # Replace with your actual database credentials
-        db_config = {
-            'host': '127.0.0.1',
-            'database': 'ispsc_tagudin_dms_db',
-            'user': 'root',  # Replace with your username
-            'password': '',  # Replace with your password
-            'port': 3306
-        }
-        
-        engine = create_engine(f"mysql+mysqlconnector://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['database']}")
-        return engine
+        return read_frame("SELECT department_id, name FROM departments")
     except Exception as e:
-        st.error(f"Error connecting to database: {e}")
-        return None
+        st.error(f"Error loading data: {e}")
+        return pd.DataFrame()
 
-# Load data function
 @st.cache_data(ttl=3600)
-def load_data():
-    engine = init_connection()
-    if engine is None:
-        return None
-    
+def load_document_types():
     try:
-        # Load all tables
-        users_df = pd.read_sql("SELECT * FROM dms_user", engine)
-        documents_df = pd.read_sql("SELECT * FROM dms_documents", engine)
-        document_types_df = pd.read_sql("SELECT * FROM document_types", engine)
-        departments_df = pd.read_sql("SELECT * FROM departments", engine)
-        announcements_df = pd.read_sql("SELECT * FROM announcements", engine)
-        notifications_df = pd.read_sql("SELECT * FROM notifications", engine)
-        doc_versions_df = pd.read_sql("SELECT * FROM dms_document_versions", engine)
-        doc_depts_df = pd.read_sql("SELECT * FROM document_departments", engine)
-        
-        # Merge documents with types
-        documents_df = documents_df.merge(document_types_df, left_on='doc_type', right_on='type_id', how='left')
-        
-        # Merge users with departments
-        users_df = users_df.merge(departments_df, left_on='department_id', right_on='department_id', how='left', suffixes=('_user', '_dept'))
-        
+        return read_frame("SELECT type_id, name FROM document_types")
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        return pd.DataFrame()
+
+# The sidebar option lists are materialised once as tuples so reruns do not
+# re-walk the name columns with .unique()
+@st.cache_data(ttl=3600)
+def load_department_names():
+    departments_df = load_departments()
+    if 'name' not in departments_df.columns:
+        return ()
+    return tuple(departments_df['name'].dropna().unique())
+
+@st.cache_data(ttl=3600)
+def load_document_type_names():
+    document_types_df = load_document_types()
+    if 'name' not in document_types_df.columns:
+        return ()
+    return tuple(document_types_df['name'].dropna().unique())
+
+@st.cache_data(ttl=3600)
+def load_dept_name():
+    # id -> name lookup Series, built once so per-rerun lookups are a map
+    departments_df = load_departments()
+    if 'name' not in departments_df.columns:
+        return pd.Series(dtype=object)
+    return departments_df.set_index('department_id')['name']
+
+@st.cache_data(ttl=3600)
+def load_users():
+    try:
+        # Attach the department name in SQL instead of merging in pandas
+        users_df = read_frame(
+            "SELECT u.*, d.name "
+            "FROM dms_user u "
+            "LEFT JOIN departments d ON u.department_id = d.department_id"
+        )
+
+        # Low-cardinality labels repeated on every row: categorical codes
+        # make value_counts/isin C-level and deduplicate the strings
+        for col in ('role', 'status', 'name'):
+            if col in users_df.columns:
+                users_df[col] = users_df[col].astype('category')
+
+        return users_df
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        return pd.DataFrame()
+
+@st.cache_data(ttl=3600)
+def load_version_counts():
+    try:
+        # Aggregate in the database; only one row per document comes back
+        return read_frame(
+            "SELECT doc_id, COUNT(*) AS version_count "
+            "FROM dms_document_versions GROUP BY doc_id"
+        )
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        return pd.DataFrame()
+
+# Headline metrics as single-row COUNT/SUM queries; the numbers stay
+# unfiltered and never require scanning the in-memory frames
+@st.cache_data(ttl=3600)
+def load_metrics():
+    try:
+        counts = run_queries({
+            'documents': "SELECT COUNT(*) AS total, COALESCE(SUM(status = 'active'), 0) AS active FROM dms_documents",
+            'users': "SELECT COUNT(*) AS total FROM dms_user",
+            'announcements': "SELECT COUNT(*) AS total FROM announcements"
+        })
+
+        return {
+            'total_docs': int(counts['documents']['total'].iloc[0]),
+            'active_docs': int(counts['documents']['active'].iloc[0]),
+            'total_users': int(counts['users']['total'].iloc[0]),
+            'total_announcements': int(counts['announcements']['total'].iloc[0])
+        }
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
         return {
-            'users': users_df,
-            'documents': documents_df,
-            'announcements': announcements_df,
-            'notifications': notifications_df,
-            'doc_versions': doc_versions_df,
-            'doc_depts': doc_depts_df,
-            'departments': departments_df,
-            'document_types': document_types_df
+            'total_docs': 0,
+            'active_docs': 0,
+            'total_users': 0,
+            'total_announcements': 0
         }
+
+# connectorx takes a plain SQL string, so the filter values are inlined;
+# they are only dates and integer ids resolved from the dimension tables,
+# never free text.
+def date_where(date_key, column='created_at'):
+    if date_key is None:
+        return ""
+    return f"WHERE {column} BETWEEN '{date_key[0]}' AND '{date_key[1]}'"
+
+# Fact tables, filtered in SQL so only the rows matching the sidebar
+# selections ever leave the database. dms_documents should be indexed on
+# (created_at), (department_id) and (doc_type) to keep these index-driven.
+@st.cache_data(ttl=3600)
+def load_documents(date_key, department_ids, type_ids):
+    try:
+        conditions = []
+        if date_key is not None:
+            conditions.append(f"d.created_at BETWEEN '{date_key[0]}' AND '{date_key[1]}'")
+        if department_ids:
+            conditions.append(f"d.department_id IN ({', '.join(str(i) for i in department_ids)})")
+        if type_ids:
+            conditions.append(f"d.doc_type IN ({', '.join(str(i) for i in type_ids)})")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        documents_df = read_frame(
+            "SELECT d.doc_id, d.title, d.doc_type, d.status, d.department_id, "
+            "d.created_by_name, d.created_at, t.name "
+            "FROM dms_documents d "
+            "LEFT JOIN document_types t ON d.doc_type = t.type_id "
+            f"{where}"
+        )
+
+        # Same categorical treatment as the user labels; title stays as-is
+        # because it is high-cardinality
+        for col in ('status', 'name'):
+            documents_df[col] = documents_df[col].astype('category')
+
+        # MySQL datetimes usually arrive typed, but nullable columns can come
+        # back as objects; normalise once here so every downstream
+        # .dt/groupby/nlargest sees datetime64 without per-use conversion
+        documents_df['created_at'] = pd.to_datetime(documents_df['created_at'], errors='coerce')
+
+        return documents_df
     except Exception as e:
         st.error(f"Error loading data: {e}")
-        return None
+        return pd.DataFrame()
 
-# Load data
-data = load_data()
+@st.cache_data(ttl=3600)
+def load_announcements(date_key):
+    try:
+        announcements_df = read_frame(
+            f"SELECT title, status, created_at FROM announcements {date_where(date_key)}"
+        )
+        announcements_df['status'] = announcements_df['status'].astype('category')
+        announcements_df['created_at'] = pd.to_datetime(announcements_df['created_at'], errors='coerce')
+        return announcements_df
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        return pd.DataFrame()
 
-if data is None:
-    st.error("Could not load data. Please check your database connection.")
-    st.stop()
+@st.cache_data(ttl=3600)
+def load_notifications(date_key):
+    try:
+        notifications_df = read_frame(
+            f"SELECT created_at FROM notifications {date_where(date_key)}"
+        )
+        notifications_df['created_at'] = pd.to_datetime(notifications_df['created_at'], errors='coerce')
+        return notifications_df
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        return pd.DataFrame()
+
+# Derived views are recomputed on every rerun otherwise, even when the user
+# only touched an unrelated widget. They are cached keyed on the sidebar
+# filter tuple; hashing the whole source frame would cost more than the
+# aggregation itself, so frames hash by a cheap fingerprint and filter_key
+# carries the real cache identity.
+def _frame_fingerprint(df):
+    if 'created_at' in df.columns and len(df):
+        return (len(df), df['created_at'].iat[-1])
+    return len(df)
+
+_view_cache = {'hash_funcs': {pd.DataFrame: _frame_fingerprint}}
+
+@st.cache_data(**_view_cache)
+def compute_value_counts(df, column, filter_key=None):
+    return df[column].value_counts()
+
+@st.cache_data(**_view_cache)
+def compute_docs_over_time(df, filter_key):
+    # Truncating to days and counting the int64 codes is much cheaper than
+    # spinning up a full daily resampler just to size the bins
+    day = pd.Series(df['created_at'].values.astype('datetime64[D]'))
+    counts = day.value_counts().sort_index()
+    return counts.rename_axis('created_at').reset_index(name='count')
+
+@st.cache_data(**_view_cache)
+def compute_timeline(df, color_col, filter_key):
+    # px.timeline renders a trace per row, so cap the figure at the most
+    # recent rows; the one-hour bar end is computed here once instead of
+    # allocating a fresh datetime array on every rerun
+    timeline = df.nlargest(50, 'created_at')[['title', 'created_at', color_col]]
+    return timeline.assign(end_at=timeline['created_at'] + pd.Timedelta(hours=1))
+
+@st.cache_data(**_view_cache)
+def compute_dept_counts(df, dept_name, filter_key):
+    # A many-to-one lookup: map against the prebuilt id -> name Series
+    # instead of paying for a full merge
+    return df['department_id'].map(dept_name).value_counts()
+
+# The dimension tables drive the sidebar, so they load first
+departments_df = load_departments()
+document_types_df = load_document_types()
 
 # Sidebar filters
 st.sidebar.header("Filters")
@@ -97,57 +278,58 @@ date_range = st.sidebar.date_input(
 
 department_filter = st.sidebar.multiselect(
     "Filter by Department",
-    options=data['departments']['name'].unique() if 'departments' in data else [],
+    options=load_department_names(),
     default=[]
 )
 
 doc_type_filter = st.sidebar.multiselect(
     "Filter by Document Type",
-    options=data['document_types']['name'].unique() if 'document_types' in data else [],
+    options=load_document_type_names(),
     default=[]
 )
 
-# Filter data based on selections
-def filter_data(df, date_col):
-    if len(date_range) == 2 and date_col in df.columns:
-        mask = (df[date_col] >= pd.to_datetime(date_range[0])) & (df[date_col] <= pd.to_datetime(date_range[1]))
-        return df.loc[mask]
-    return df
+# Resolve the selected names to ids so the filters can be pushed down to SQL
+date_key = tuple(date_range) if len(date_range) == 2 else None
+dept_ids = tuple(int(i) for i in departments_df[departments_df['name'].isin(department_filter)]['department_id']) if department_filter else ()
+type_ids = tuple(int(i) for i in document_types_df[document_types_df['name'].isin(doc_type_filter)]['type_id']) if doc_type_filter else ()
+
+# Lazy namespace over the per-table loaders: each section calls only the
+# tables it actually renders, and every call after the first hits the cache
+data = SimpleNamespace(
+    documents=partial(load_documents, date_key, dept_ids, type_ids),
+    announcements=partial(load_announcements, date_key),
+    notifications=partial(load_notifications, date_key),
+    users=load_users,
+    version_counts=load_version_counts,
+    departments=load_departments,
+    document_types=load_document_types,
+    dept_name=load_dept_name
+)
 
-# Safely filter data
-filtered_docs = filter_data(data['documents'], 'created_at') if 'documents' in data else pd.DataFrame()
-filtered_announcements = filter_data(data['announcements'], 'created_at') if 'announcements' in data else pd.DataFrame()
-filtered_notifications = filter_data(data['notifications'], 'created_at') if 'notifications' in data else pd.DataFrame()
+metrics = load_metrics()
 
-if department_filter and 'documents' in data and 'department_id' in data['documents'].columns:
-    dept_ids = data['departments'][data['departments']['name'].isin(department_filter)]['department_id']
-    filtered_docs = filtered_docs[filtered_docs['department_id'].isin(dept_ids)]
+# One tuple captures the sidebar state; cached derived views key on it
+filter_key = (date_key, dept_ids, type_ids)
 
-if doc_type_filter and 'name' in filtered_docs.columns:
-    filtered_docs = filtered_docs[filtered_docs['name'].isin(doc_type_filter)]
+# The document rows back most sections, pre-filtered from SQL
+filtered_docs = data.documents()
+filtered_announcements = data.announcements()
 
 # Metrics row
 st.subheader("Key Metrics")
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_docs = len(data['documents']) if 'documents' in data else 0
-    st.metric("Total Documents", total_docs)
+    st.metric("Total Documents", metrics['total_docs'])
 
 with col2:
-    total_users = len(data['users']) if 'users' in data else 0
-    st.metric("Total Users", total_users)
+    st.metric("Total Users", metrics['total_users'])
 
 with col3:
-    if 'documents' in data and 'status' in data['documents'].columns:
-        active_docs = len(data['documents'][data['documents']['status'] == 'active'])
-    else:
-        active_docs = 0
-    st.metric("Active Documents", active_docs)
+    st.metric("Active Documents", metrics['active_docs'])
 
 with col4:
-    total_announcements = len(data['announcements']) if 'announcements' in data else 0
-    st.metric("Total Announcements", total_announcements)
+    st.metric("Total Announcements", metrics['total_announcements'])
 
 # Charts and visualizations
 st.markdown("---")
@@ -169,7 +351,7 @@ with tab1:
         with col1:
             # Documents by type
             if 'name' in filtered_docs.columns:
-                doc_type_counts = filtered_docs['name'].value_counts()
+                doc_type_counts = compute_value_counts(filtered_docs, 'name', filter_key)
                 fig = px.pie(
                     values=doc_type_counts.values, 
                     names=doc_type_counts.index, 
@@ -182,7 +364,7 @@ with tab1:
         with col2:
             # Documents status
             if 'status' in filtered_docs.columns:
-                status_counts = filtered_docs['status'].value_counts()
+                status_counts = compute_value_counts(filtered_docs, 'status', filter_key)
                 fig = px.bar(
                     x=status_counts.index, 
                     y=status_counts.values,
@@ -195,7 +377,7 @@ with tab1:
         
         # Documents over time
         if 'created_at' in filtered_docs.columns:
-            docs_over_time = filtered_docs.groupby(pd.Grouper(key='created_at', freq='D')).size().reset_index(name='count')
+            docs_over_time = compute_docs_over_time(filtered_docs, filter_key)
             if not docs_over_time.empty:
                 fig = px.line(
                     docs_over_time, 
@@ -212,13 +394,14 @@ with tab1:
         st.info("No document data available for the selected filters")
 
 with tab2:
-    if 'users' in data and not data['users'].empty:
+    users_df = data.users()
+    if not users_df.empty:
         col1, col2 = st.columns(2)
-        
+
         with col1:
             # Users by role
-            if 'role' in data['users'].columns:
-                role_counts = data['users']['role'].value_counts()
+            if 'role' in users_df.columns:
+                role_counts = compute_value_counts(users_df, 'role')
                 fig = px.pie(
                     values=role_counts.values, 
                     names=role_counts.index, 
@@ -230,8 +413,8 @@ with tab2:
         
         with col2:
             # Users by status
-            if 'status' in data['users'].columns:
-                status_counts = data['users']['status'].value_counts()
+            if 'status' in users_df.columns:
+                status_counts = compute_value_counts(users_df, 'status')
                 fig = px.bar(
                     x=status_counts.index, 
                     y=status_counts.values,
@@ -243,8 +426,8 @@ with tab2:
                 st.info("Status data not available")
         
         # Users by department
-        if 'name' in data['users'].columns:
-            user_dept_counts = data['users']['name'].value_counts()
+        if 'name' in users_df.columns:
+            user_dept_counts = compute_value_counts(users_df, 'name')
             fig = px.bar(
                 x=user_dept_counts.index, 
                 y=user_dept_counts.values,
@@ -258,22 +441,18 @@ with tab2:
         st.info("No user data available")
 
 with tab3:
-    if not filtered_docs.empty and 'departments' in data:
+    if not filtered_docs.empty:
         # Department document counts
         if 'department_id' in filtered_docs.columns:
-            dept_docs = filtered_docs.merge(data['departments'], left_on='department_id', right_on='department_id', how='left')
-            if 'name_y' in dept_docs.columns:
-                dept_counts = dept_docs['name_y'].value_counts()
-                
-                fig = px.bar(
-                    x=dept_counts.index, 
-                    y=dept_counts.values,
-                    title='Documents by Department',
-                    labels={'x': 'Department', 'y': 'Count'}
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("Could not merge department data")
+            dept_counts = compute_dept_counts(filtered_docs, data.dept_name(), filter_key)
+
+            fig = px.bar(
+                x=dept_counts.index,
+                y=dept_counts.values,
+                title='Documents by Department',
+                labels={'x': 'Department', 'y': 'Count'}
+            )
+            st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("Department ID not found in documents")
     else:
@@ -282,14 +461,13 @@ with tab3:
 with tab4:
     # Documents timeline
     if not filtered_docs.empty and 'created_at' in filtered_docs.columns and 'title' in filtered_docs.columns:
-        docs_timeline = filtered_docs[['title', 'created_at', 'name']].copy()
-        docs_timeline['date'] = docs_timeline['created_at'].dt.date
-        
+        docs_timeline = compute_timeline(filtered_docs, 'name', filter_key)
+
         fig = px.timeline(
-            docs_timeline, 
-            x_start="created_at", 
-            x_end=docs_timeline['created_at'] + pd.Timedelta(hours=1),
-            y="title", 
+            docs_timeline,
+            x_start="created_at",
+            x_end="end_at",
+            y="title",
             color="name",
             title="Document Creation Timeline"
         )
@@ -299,12 +477,12 @@ with tab4:
     
     # Announcements timeline
     if not filtered_announcements.empty and 'created_at' in filtered_announcements.columns and 'title' in filtered_announcements.columns:
-        ann_timeline = filtered_announcements[['title', 'created_at', 'status']].copy()
+        ann_timeline = compute_timeline(filtered_announcements, 'status', filter_key)
         fig = px.timeline(
-            ann_timeline, 
-            x_start="created_at", 
-            x_end=ann_timeline['created_at'] + pd.Timedelta(hours=1),
-            y="title", 
+            ann_timeline,
+            x_start="created_at",
+            x_end="end_at",
+            y="title",
             color="status",
             title="Announcements Timeline"
         )
@@ -324,10 +502,11 @@ with tab5:
         st.info("No document data available")
     
     st.subheader("Users Data")
-    if 'users' in data and not data['users'].empty:
-        display_cols = [col for col in ['user_id', 'Username', 'firstname', 'lastname', 'role', 'status', 'name'] if col in data['users'].columns]
+    users_df = data.users()
+    if not users_df.empty:
+        display_cols = [col for col in ['user_id', 'Username', 'firstname', 'lastname', 'role', 'status', 'name'] if col in users_df.columns]
         st.dataframe(
-            data['users'][display_cols],
+            users_df[display_cols],
             use_container_width=True
         )
     else:
@@ -339,8 +518,9 @@ st.subheader("Advanced Analytics")
 
 # Document version analysis
 if st.checkbox("Show Document Version Analysis"):
-    if 'doc_versions' in data and not data['doc_versions'].empty:
-        version_counts = data['doc_versions'].groupby('doc_id').size().reset_index(name='version_count')
+    # The version table is only fetched when the analysis is requested
+    version_counts = data.version_counts()
+    if not version_counts.empty:
         fig = px.histogram(
             version_counts, 
             x='version_count',
@@ -354,7 +534,7 @@ if st.checkbox("Show Document Version Analysis"):
 # User activity analysis
 if st.checkbox("Show User Activity Analysis"):
     if not filtered_docs.empty and 'created_by_name' in filtered_docs.columns:
-        user_doc_counts = filtered_docs['created_by_name'].value_counts().reset_index()
+        user_doc_counts = compute_value_counts(filtered_docs, 'created_by_name', filter_key).reset_index()
         user_doc_counts.columns = ['user', 'document_count']
         
         fig = px.bar(
@@ -373,12 +553,19 @@ st.sidebar.markdown("---")
 st.sidebar.subheader("Export Options")
 
 # CSV Export
+# Write the CSV into a bytes buffer chunk by chunk instead of building the
+# whole export as one Python string
+def csv_buffer(df):
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False, chunksize=50_000)
+    buf.seek(0)
+    return buf
+
 if st.sidebar.button("Export Documents Data as CSV"):
     if not filtered_docs.empty:
-        csv = filtered_docs.to_csv(index=False)
         st.sidebar.download_button(
             label="Download CSV",
-            data=csv,
+            data=csv_buffer(filtered_docs),
             file_name="documents_data.csv",
             mime="text/csv"
         )
@@ -386,11 +573,11 @@ if st.sidebar.button("Export Documents Data as CSV"):
         st.sidebar.warning("No document data to export")
 
 if st.sidebar.button("Export Users Data as CSV"):
-    if 'users' in data and not data['users'].empty:
-        csv = data['users'].to_csv(index=False)
+    users_df = data.users()
+    if not users_df.empty:
         st.sidebar.download_button(
             label="Download CSV",
-            data=csv,
+            data=csv_buffer(users_df),
             file_name="users_data.csv",
             mime="text/csv"
         )
@@ -409,10 +596,11 @@ if st.sidebar.button("Generate PDF Report"):
     with st.spinner("Generating PDF report..."):
         try:
             # Create PDF with custom options
-            pdf = create_pdf_report(data, filtered_docs, date_range, department_filter, doc_type_filter)
+            pdf = create_pdf_report(data, filtered_docs, date_range, department_filter, doc_type_filter, metrics)
             
-            # Save PDF to bytes buffer
-            pdf_output = pdf.output(dest='S').encode('latin1', 'replace')
+            # fpdf2 returns the document as a bytearray directly; no
+            # str-then-latin1 round trip
+            pdf_output = bytes(pdf.output())
             
             # Create download link
             st.sidebar.markdown(create_download_link(pdf_output, f"{report_title.replace(' ', '_')}.pdf"), unsafe_allow_html=True)
@@ -2,6 +2,18 @@ from fpdf import FPDF
 import pandas as pd
 from datetime import datetime
 
+# Single-pass replacement table for symbols FPDF's latin-1 fonts cannot
+# render; any other non-ASCII character is stripped by the encode step in
+# safe_text
+_SAFE_TABLE = str.maketrans({
+    '•': '-',
+    '✅': '[OK]',
+    '❌': '[ERROR]',
+    '📊': '[CHART]',
+    '📄': '[DOC]',
+    '🔄': '[REFRESH]'
+})
+
 # Custom PDF class with better design and UTF-8 support
 class CustomPDF(FPDF):
     def __init__(self):
@@ -49,15 +61,9 @@ class CustomPDF(FPDF):
     def safe_text(self, text):
         """Convert text to ASCII-safe characters"""
         if isinstance(text, str):
-            # Replace problematic characters
-            text = text.replace('•', '-')
-            text = text.replace('✅', '[OK]')
-            text = text.replace('❌', '[ERROR]')
-            text = text.replace('📊', '[CHART]')
-            text = text.replace('📄', '[DOC]')
-            text = text.replace('🔄', '[REFRESH]')
-            # Remove any other non-ASCII characters
-            text = text.encode('ascii', 'ignore').decode('ascii')
+            # One translate pass for the known symbols, one encode pass to
+            # strip any remaining non-ASCII characters
+            return text.translate(_SAFE_TABLE).encode('ascii', 'ignore').decode('ascii')
         return str(text)
     
     def add_metric_card(self, title, value, width=45, height=20):
@@ -69,6 +75,18 @@ class CustomPDF(FPDF):
         safe_value = self.safe_text(value)
         self.cell(width, height, f"{safe_title}: {safe_value}", 1, 0, 'C', 1)
     
+    def add_count_block(self, heading, counts, unit):
+        # Set font for the heading
+        self.set_font('Arial', 'B', 12)
+        self.cell(0, 10, heading, 0, 1)
+
+        # Emit the whole block as one multi_cell: one font setup and one
+        # page-break check regardless of the number of categories
+        self.set_font('Arial', '', 10)
+        lines = "\n".join(f"- {self.safe_text(label)}: {count} {unit}" for label, count in counts.items())
+        self.multi_cell(0, 8, lines)
+        self.ln(5)
+
     def add_table_header(self, headers, col_widths):
         # Set font for header
         self.set_font('Arial', 'B', 10)
@@ -95,7 +113,7 @@ class CustomPDF(FPDF):
         self.ln()
 
 # Function to create PDF report with custom design
-def create_pdf_report(data, filtered_docs, date_range, department_filter, doc_type_filter):
+def create_pdf_report(data, filtered_docs, date_range, department_filter, doc_type_filter, metrics):
     pdf = CustomPDF()
     pdf.add_page()
     
@@ -113,19 +131,13 @@ def create_pdf_report(data, filtered_docs, date_range, department_filter, doc_ty
     # Executive Summary
     pdf.chapter_title("EXECUTIVE SUMMARY")
     
-    # Key Metrics in a grid layout
-    total_docs = len(data['documents']) if 'documents' in data else 0
-    total_users = len(data['users']) if 'users' in data else 0
-    active_docs = len(data['documents'][data['documents']['status'] == 'active']) if 'documents' in data and 'status' in data['documents'].columns else 0
-    total_announcements = len(data['announcements']) if 'announcements' in data else 0
-    
-    # Create metrics grid
+    # Key Metrics in a grid layout, from the pre-aggregated COUNT queries
     pdf.set_font('Arial', 'B', 12)
-    pdf.add_metric_card("Total Documents", total_docs)
-    pdf.add_metric_card("Total Users", total_users)
+    pdf.add_metric_card("Total Documents", metrics['total_docs'])
+    pdf.add_metric_card("Total Users", metrics['total_users'])
     pdf.ln(12)
-    pdf.add_metric_card("Active Documents", active_docs)
-    pdf.add_metric_card("Announcements", total_announcements)
+    pdf.add_metric_card("Active Documents", metrics['active_docs'])
+    pdf.add_metric_card("Announcements", metrics['total_announcements'])
     pdf.ln(15)
     
     # Document Analysis
@@ -134,27 +146,11 @@ def create_pdf_report(data, filtered_docs, date_range, department_filter, doc_ty
     if not filtered_docs.empty:
         # Documents by type
         if 'name' in filtered_docs.columns:
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(0, 10, "Documents by Type:", 0, 1)
-            pdf.set_font('Arial', '', 10)
-            
-            doc_type_counts = filtered_docs['name'].value_counts()
-            for doc_type, count in doc_type_counts.items():
-                safe_doc_type = pdf.safe_text(doc_type)
-                pdf.cell(0, 8, f"- {safe_doc_type}: {count} documents", 0, 1)
-            pdf.ln(5)
-        
+            pdf.add_count_block("Documents by Type:", filtered_docs['name'].value_counts(), "documents")
+
         # Documents by status
         if 'status' in filtered_docs.columns:
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(0, 10, "Documents by Status:", 0, 1)
-            pdf.set_font('Arial', '', 10)
-            
-            status_counts = filtered_docs['status'].value_counts()
-            for status, count in status_counts.items():
-                safe_status = pdf.safe_text(status)
-                pdf.cell(0, 8, f"- {safe_status}: {count} documents", 0, 1)
-            pdf.ln(5)
+            pdf.add_count_block("Documents by Status:", filtered_docs['status'].value_counts(), "documents")
     else:
         pdf.cell(0, 8, "No document data available for selected filters", 0, 1)
     
@@ -163,30 +159,15 @@ def create_pdf_report(data, filtered_docs, date_range, department_filter, doc_ty
     # User Analysis
     pdf.chapter_title("USER ANALYSIS")
     
-    if 'users' in data and not data['users'].empty:
+    users_df = data.users()
+    if not users_df.empty:
         # Users by role
-        if 'role' in data['users'].columns:
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(0, 10, "Users by Role:", 0, 1)
-            pdf.set_font('Arial', '', 10)
-            
-            role_counts = data['users']['role'].value_counts()
-            for role, count in role_counts.items():
-                safe_role = pdf.safe_text(role)
-                pdf.cell(0, 8, f"- {safe_role}: {count} users", 0, 1)
-            pdf.ln(5)
-        
+        if 'role' in users_df.columns:
+            pdf.add_count_block("Users by Role:", users_df['role'].value_counts(), "users")
+
         # Users by status
-        if 'status' in data['users'].columns:
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(0, 10, "Users by Status:", 0, 1)
-            pdf.set_font('Arial', '', 10)
-            
-            status_counts = data['users']['status'].value_counts()
-            for status, count in status_counts.items():
-                safe_status = pdf.safe_text(status)
-                pdf.cell(0, 8, f"- {safe_status}: {count} users", 0, 1)
-            pdf.ln(5)
+        if 'status' in users_df.columns:
+            pdf.add_count_block("Users by Status:", users_df['status'].value_counts(), "users")
     else:
         pdf.cell(0, 8, "No user data available", 0, 1)
     
@@ -200,25 +181,20 @@ def create_pdf_report(data, filtered_docs, date_range, department_filter, doc_ty
         pdf.cell(0, 10, "Recent Documents:", 0, 1)
         pdf.set_font('Arial', '', 10)
         
-        # Get recent documents
-        recent_docs = filtered_docs.nlargest(5, 'created_at')
-        
-        for _, row in recent_docs.iterrows():
-            title = row.get('title', 'N/A')
-            doc_type = row.get('name', 'N/A')
-            status = row.get('status', 'N/A')
-            created_at = row.get('created_at', 'N/A')
-            
-            if isinstance(created_at, pd.Timestamp):
-                created_at = created_at.strftime('%Y-%m-%d %H:%M')
-            
+        # Get recent documents; created_at is guaranteed datetime64 at load,
+        # so the timestamps format in one pass instead of a per-row type check
+        recent_docs = filtered_docs.nlargest(5, 'created_at').assign(
+            created_str=lambda d: d['created_at'].dt.strftime('%Y-%m-%d %H:%M')
+        )
+
+        for title, doc_type, status, created_str in recent_docs[['title', 'name', 'status', 'created_str']].itertuples(index=False, name=None):
             # Use safe text for all values
             safe_title = pdf.safe_text(title)[:50] + "..." if len(str(title)) > 50 else pdf.safe_text(title)
             safe_doc_type = pdf.safe_text(doc_type)
             safe_status = pdf.safe_text(status)
-            
+
             pdf.cell(0, 8, f"- {safe_title}", 0, 1)
-            pdf.cell(0, 8, f"  Type: {safe_doc_type} | Status: {safe_status} | Created: {created_at}", 0, 1)
+            pdf.cell(0, 8, f"  Type: {safe_doc_type} | Status: {safe_status} | Created: {created_str}", 0, 1)
             pdf.ln(2)
     else:
         pdf.cell(0, 8, "No recent activity data available", 0, 1)
@@ -235,24 +211,21 @@ def create_pdf_report(data, filtered_docs, date_range, department_filter, doc_ty
         col_widths = [15, 70, 40, 30, 35]
         
         pdf.add_table_header(headers, col_widths)
-        
+
+        # Precompute the safe strings column-wise, then iterate plain tuples
+        # instead of boxing every row into a Series with iterrows
+        table_docs = filtered_docs.assign(
+            safe_title=filtered_docs['title'].astype(str).map(
+                lambda t: pdf.safe_text(t)[:40] + "..." if len(t) > 40 else pdf.safe_text(t)
+            ),
+            safe_type=filtered_docs['name'].astype(str).map(pdf.safe_text),
+            safe_status=filtered_docs['status'].astype(str).map(pdf.safe_text),
+            created_str=filtered_docs['created_at'].dt.strftime('%Y-%m-%d')
+        )
+
         # Table rows
-        for _, row in filtered_docs.iterrows():
-            doc_id = row.get('doc_id', 'N/A')
-            title = str(row.get('title', 'N/A'))
-            doc_type = row.get('name', 'N/A')
-            status = row.get('status', 'N/A')
-            created_at = row.get('created_at', 'N/A')
-            
-            if isinstance(created_at, pd.Timestamp):
-                created_at = created_at.strftime('%Y-%m-%d')
-            
-            # Use safe text for all values
-            safe_title = pdf.safe_text(title)[:40] + "..." if len(str(title)) > 40 else pdf.safe_text(title)
-            safe_doc_type = pdf.safe_text(doc_type)
-            safe_status = pdf.safe_text(status)
-            
-            pdf.add_table_row([doc_id, safe_title, safe_doc_type, safe_status, created_at], col_widths)
+        for row in table_docs[['doc_id', 'safe_title', 'safe_type', 'safe_status', 'created_str']].itertuples(index=False, name=None):
+            pdf.add_table_row(row, col_widths)
     
     return pdf
 